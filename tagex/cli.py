@@ -5,7 +5,7 @@ CLI 模块 - 命令行接口
 """
 
 from pathlib import Path
-from typing import Optional, Union
+from typing import List, Optional, Union
 import typer
 from rich.console import Console
 from rich.panel import Panel
@@ -31,10 +31,10 @@ def extract(
         exists=True,
         resolve_path=True
     ),
-    tag: str = typer.Option(
-        "TODO:",
+    tag: List[str] = typer.Option(
+        ["TODO:"],
         "--tag", "-t",
-        help="要搜索的标签"
+        help="要搜索的标签（可重复指定以同时搜索多个标签）"
     ),
     output: Optional[Path] = typer.Option(
         None,
@@ -70,6 +70,17 @@ def extract(
         False,
         "--quiet", "-q",
         help="静默模式，不显示进度"
+    ),
+    jobs: Optional[int] = typer.Option(
+        None,
+        "--jobs", "-j",
+        min=1,
+        help="并行进程数（默认为 CPU 核数，1 为串行；包含标签的文件合计不足 4 MiB 时始终串行）"
+    ),
+    use_cache: bool = typer.Option(
+        False,
+        "--cache",
+        help="缓存已解析文件的定义位置，加速重复搜索"
     )
 ) -> None:
     """
@@ -86,6 +97,9 @@ def extract(
         # 搜索并保存
         tagex extract ./src --tag "TODO:" --output todos.md
         
+        # 同时搜索多个标签
+        tagex extract ./src --tag "TODO:" --tag "FIXME:"
+        
         # 只搜索函数
         tagex extract ./src --tag "FIXME:" --no-classes
         
@@ -93,16 +107,19 @@ def extract(
         tagex extract ./src --tag "TODO:" --table
     """
     config = ExtractorConfig(
-        tag=tag,
+        tag=tag[0],
+        extra_tags=tag[1:],
         target_path=path,
         include_functions=not no_functions,
-        include_classes=not no_classes
+        include_classes=not no_classes,
+        max_workers=jobs,
+        use_cache=use_cache
     )
     
     if not quiet:
         mode = "单文件" if config.is_single_file else "目录递归"
         console.print(Panel(
-            f"[cyan]标签:[/cyan] [bold]{tag}[/bold]\n"
+            f"[cyan]标签:[/cyan] [bold]{', '.join(config.tags)}[/bold]\n"
             f"[cyan]模式:[/cyan] {mode}\n"
             f"[cyan]路径:[/cyan] {path}\n"
             f"[cyan]包含:[/cyan] "
@@ -134,7 +151,7 @@ def version() -> None:
         "[bold cyan]Tag Extractor[/bold cyan]\n"
         "版本: 1.0.0\n"
         "支持单文件和目录搜索\n"
-        "基于 Pydantic V2 + libcst + Rich",
+        "基于 Pydantic V2 + ast + Rich",
         title="📦 版本信息",
         border_style="cyan"
     ))
@@ -148,7 +165,8 @@ def extract_tags(
     output_file: Optional[Union[str, Path]] = None,
     output_format: str = "markdown",
     show_progress: bool = True,
-    show_code: bool = True
+    show_code: bool = True,
+    max_workers: Optional[int] = 1
 ) -> ExtractionResult:
     """
     便捷函数：提取代码中的特定标签
@@ -162,6 +180,8 @@ def extract_tags(
         output_format: 输出格式 (markdown 或 plain)
         show_progress: 是否显示进度条
         show_code: 是否显示代码内容
+        max_workers: 并行进程数（默认 1 为串行，None 为 CPU 核数）。
+            并行时调用脚本需要 if __name__ == "__main__" 保护
     
     Returns:
         提取结果
@@ -170,7 +190,8 @@ def extract_tags(
         tag=tag,
         target_path=Path(path),
         include_functions=include_functions,
-        include_classes=include_classes
+        include_classes=include_classes,
+        max_workers=max_workers
     )
     
     extractor = TagExtractor(config=config)
@@ -192,10 +213,14 @@ def main() -> None:
         app()
     except Exception as e:
         t = Traceback.from_exception(type(e), e, e.__traceback__)
-        with console.capture() as capture:
-            console.print(t)
         if logger:
+            with console.capture() as capture:
+                console.print(t)
             logger.info("\n" + capture.get())
+        else:
+            # 关闭了自动日志（TAGEX_NO_AUTO_LOG）时直接输出到 stderr，不能静默吞掉错误
+            Console(stderr=True).print(t)
+        raise SystemExit(1)
 
 if __name__ == "__main__":
     main()
@@ -8,9 +8,11 @@ from tagex.core.schemas import (
     TaggedCode,
     ExtractorConfig,
     ExtractionResult,
-    NodeCollectionResult
+    NodeCollectionResult,
+    DefinitionSpan
 )
 from tagex.core.extractor import TagExtractor, TagCollector
+from tagex.core.cache import DefinitionCache
 from tagex.core.formatter import OutputFormatter
 
 __all__ = [
@@ -18,7 +20,9 @@ __all__ = [
     "ExtractorConfig",
     "ExtractionResult",
     "NodeCollectionResult",
+    "DefinitionSpan",
     "TagExtractor",
     "TagCollector",
+    "DefinitionCache",
     "OutputFormatter"
 ]
\ No newline at end of file
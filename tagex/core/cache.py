@@ -0,0 +1,121 @@
+"""
+定义位置缓存模块
+
+本模块提供基于 sqlite3 的磁盘缓存：
+- DefinitionCache: 按文件内容摘要缓存文件中所有函数和类的 DefinitionSpan
+
+缓存内容与标签无关，因此使用不同标签重复运行时，未修改的文件无需重新解析
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+from pathlib import Path
+from typing import List, Optional
+
+from tagex.core.schemas import DefinitionSpan
+
+
+class DefinitionCache:
+    """定义位置的磁盘缓存"""
+    
+    # 解析规则或存储格式变化时递增，使旧缓存自动失效
+    VERSION: int = 2
+    
+    def __init__(self, db_path: Optional[Path] = None):
+        """
+        初始化缓存
+        
+        Args:
+            db_path: 数据库文件路径（默认为 default_path()）
+        """
+        self.db_path: Path = db_path if db_path is not None else self.default_path()
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        # 多个工作进程可能同时写入，使用 WAL 模式并设置较长的锁等待时间
+        self._conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS definitions (digest BLOB PRIMARY KEY, spans TEXT NOT NULL)"
+        )
+    
+    @staticmethod
+    def default_path() -> Path:
+        """获取默认缓存路径（遵循 XDG_CACHE_HOME）"""
+        cache_home = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+        return Path(cache_home) / "tagex" / "definitions.db"
+    
+    @classmethod
+    def digest(cls, data: bytes) -> bytes:
+        """
+        计算文件内容的缓存键
+        
+        使用内容摘要而非 mtime，文件在读取期间被修改也不会写入过期数据；
+        缓存版本和 Python 版本参与计算，语法变化时不会命中旧结果
+        """
+        person = f"tagex{cls.VERSION}py{sys.version_info.major}{sys.version_info.minor}"
+        return hashlib.blake2b(data, digest_size=16, person=person.encode()).digest()
+    
+    def get(self, digest: bytes) -> Optional[List[DefinitionSpan]]:
+        """查询缓存，未命中时返回 None"""
+        try:
+            row = self._conn.execute(
+                "SELECT spans FROM definitions WHERE digest = ?", (digest,)
+            ).fetchone()
+        except sqlite3.Error:
+            return None
+        
+        if row is None:
+            return None
+        return [DefinitionSpan(*span) for span in json.loads(row[0])]
+    
+    def put(self, digest: bytes, spans: List[DefinitionSpan]) -> None:
+        """写入缓存，写入失败时忽略（缓存不影响提取结果）"""
+        try:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO definitions (digest, spans) VALUES (?, ?)",
+                (digest, json.dumps(spans))
+            )
+        except sqlite3.Error:
+            pass
+    
+    def close(self) -> None:
+        """关闭数据库连接"""
+        self._conn.close()
+
+
+# ============================================
+# 单元测试
+# ============================================
+
+import pytest
+import tempfile
+from typing import no_type_check
+
+
+@no_type_check
+class TestDefinitionCache:
+    """测试 DefinitionCache 类"""
+    
+    def test_put_and_get(self) -> None:
+        """测试写入后读取"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache = DefinitionCache(Path(tmpdir) / "cache.db")
+            digest = DefinitionCache.digest(b"def func(): pass\n")
+            spans = [DefinitionSpan("func", "function", 1, 1, 1)]
+            
+            assert cache.get(digest) is None
+            cache.put(digest, spans)
+            assert cache.get(digest) == spans
+            cache.close()
+    
+    def test_digest_depends_on_content(self) -> None:
+        """测试缓存键随内容变化"""
+        assert DefinitionCache.digest(b"a") == DefinitionCache.digest(b"a")
+        assert DefinitionCache.digest(b"a") != DefinitionCache.digest(b"b")
+    
+    def test_default_path(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        """测试默认路径遵循 XDG_CACHE_HOME"""
+        monkeypatch.setenv("XDG_CACHE_HOME", "/tmp/xdg")
+        assert DefinitionCache.default_path() == Path("/tmp/xdg/tagex/definitions.db")
@@ -8,18 +8,89 @@
 - 树形视图
 """
 
+import io
+import os
+from functools import lru_cache
 from pathlib import Path
-from rich.console import Console
-from rich.table import Table
-from rich.syntax import Syntax
-from rich.panel import Panel
-from rich.tree import Tree
-from rich import box
+from typing import TYPE_CHECKING, Callable, Dict, List, TextIO, Tuple
 
-from tagex.core.schemas import ExtractionResult
+from tagex.core.schemas import ExtractionResult, TaggedCode
 
+# Rich 只在终端输出时才需要，延迟到使用时导入，仅保存文件时不承担其导入开销
+if TYPE_CHECKING:
+    from rich.console import Console, RenderableType
+    from rich.syntax import Syntax
 
-console = Console()
+
+@lru_cache(maxsize=1)
+def _get_console() -> "Console":
+    """
+    获取共享的终端输出对象
+    
+    输出中需要的样式都已通过标记或 Text 显式指定，关闭 Rich 的自动高亮，
+    避免对每段输出的字符串再跑一遍高亮正则
+    """
+    from rich.console import Console
+    return Console(highlight=False)
+
+# 节点类型对应的图标，同时决定按类型预生成的模板
+_NODE_ICON: Dict[str, str] = {"function": "🔧", "class": "📦"}
+
+
+def _compile_branch_formatter() -> Callable[[TaggedCode], str]:
+    """
+    生成树形视图中匹配项标签的格式化函数
+
+    图标和标记按节点类型预先拼成模板，逐项只需填入名称和行号
+    """
+    templates: Dict[str, str] = {
+        node_type: (
+            f"{icon} [green]{{name}}[/green] "
+            f"[dim]({node_type}, 第 {{line_number}} 行)[/dim]"
+        )
+        for node_type, icon in _NODE_ICON.items()
+    }
+    
+    def format_branch(item: TaggedCode) -> str:
+        return templates[item.node_type].format(name=item.name, line_number=item.line_number)
+    
+    return format_branch
+
+
+def _compile_detail_formatter(theme: str = "monokai") -> Callable[[TaggedCode], Tuple[str, "Syntax"]]:
+    """
+    生成详细代码中匹配项的格式化函数，返回 (标题, 代码高亮)
+
+    标题模板按节点类型预先生成；词法分析器和配色主题只创建一次，
+    由所有代码块共用，避免每个 Syntax 各自按名称查找并实例化
+    """
+    templates: Dict[str, str] = {
+        node_type: (
+            f"\n[bold yellow]{node_type.upper()}[/bold yellow] "
+            f"[bold green]{{name}}[/bold green] "
+            f"[dim](第 {{line_number}} 行)[/dim]"
+        )
+        for node_type in _NODE_ICON
+    }
+    from rich.syntax import Syntax
+    
+    # 通过 Rich 按名称取得 Python 词法分析器，不直接依赖 pygments；取不到时退回按名称查找
+    lexer = Syntax("", "python").lexer or "python"
+    syntax_theme = Syntax.get_theme(theme)
+    
+    def format_detail(item: TaggedCode) -> Tuple[str, "Syntax"]:
+        header = templates[item.node_type].format(name=item.name, line_number=item.line_number)
+        syntax = Syntax(
+            item.code,
+            lexer,
+            theme=syntax_theme,
+            line_numbers=True,
+            start_line=item.line_number,
+            highlight_lines=set()
+        )
+        return header, syntax
+    
+    return format_detail
 
 
 class OutputFormatter:
@@ -28,11 +99,15 @@ class OutputFormatter:
     @staticmethod
     def print_summary(result: ExtractionResult) -> None:
         """打印摘要信息"""
+        from rich import box
+        from rich.table import Table
+        
+        console = _get_console()
         table = Table(title="提取摘要", box=box.ROUNDED, show_header=False)
         table.add_column("项目", style="cyan", no_wrap=True)
         table.add_column("值", style="magenta")
         
-        table.add_row("搜索标签", f"[bold]{result.config.tag}[/bold]")
+        table.add_row("搜索标签", f"[bold]{', '.join(result.config.tags)}[/bold]")
         
         if result.config.is_single_file:
             table.add_row("搜索模式", "[bold]单文件[/bold]")
@@ -44,112 +119,120 @@ class OutputFormatter:
         
         table.add_row("找到匹配项", f"[bold green]{result.total_matches}[/bold green]")
         
-        if result.skipped_files:
+        if result.skipped_count:
             table.add_row(
                 "跳过文件数",
-                f"[yellow]{len(result.skipped_files)}[/yellow]"
+                f"[yellow]{result.skipped_count}[/yellow]"
             )
         
         console.print(table)
         console.print()
         
-        if result.skipped_files:
+        if result.skipped_count:
+            preview = result.skipped_files[:ExtractionResult.SKIPPED_PREVIEW_SIZE]
             console.print("[yellow]⚠ 跳过的文件:[/yellow]")
-            for skipped in result.skipped_files[:10]:
+            for skipped in preview:
                 console.print(f"  [dim]• {skipped}[/dim]")
-            if len(result.skipped_files) > 10:
-                console.print(f"  [dim]... 还有 {len(result.skipped_files) - 10} 个文件[/dim]")
+            if result.skipped_count > len(preview):
+                console.print(f"  [dim]... 还有 {result.skipped_count - len(preview)} 个文件[/dim]")
             console.print()
     
     @staticmethod
     def print_results(result: ExtractionResult, show_code: bool = True) -> None:
         """打印结果 - Rich 格式"""
+        from rich.console import Group
+        from rich.panel import Panel
+        from rich.text import Text
+        from rich.tree import Tree
+        
+        console = _get_console()
         if result.total_matches == 0:
             console.print(Panel(
-                f"[yellow]未找到包含标签 '{result.config.tag}' 的代码[/yellow]",
+                f"[yellow]未找到包含标签 '{', '.join(result.config.tags)}' 的代码[/yellow]",
                 title="搜索结果",
                 border_style="yellow"
             ))
             return
         
         grouped = result.group_by_file()
+        file_paths = sorted(grouped.keys(), key=os.fspath)
         
         tree = Tree(
             f"[bold cyan]找到 {result.total_matches} 个匹配项[/bold cyan]",
             guide_style="dim"
         )
         
-        for file_path in sorted(grouped.keys()):
+        # 树和详细代码在同一次遍历中构建，每个匹配项只访问一次
+        format_branch = _compile_branch_formatter()
+        format_detail = _compile_detail_formatter() if show_code else None
+        details: List[Group] = []
+        for file_path in file_paths:
             items = grouped[file_path]
             file_branch = tree.add(
                 f"[bold blue]📄 {file_path}[/bold blue] [dim]({len(items)} 个匹配)[/dim]"
             )
             
-            for item in sorted(items, key=lambda x: x.line_number):
-                icon = "🔧" if item.node_type == "function" else "📦"
-                file_branch.add(
-                    f"{icon} [green]{item.name}[/green] [dim]({item.node_type}, 第 {item.line_number} 行)[/dim]"
-                )
+            if format_detail is None:
+                for item in items:
+                    file_branch.add(format_branch(item))
+                continue
+            
+            renderables: List["RenderableType"] = [Panel(
+                f"[bold]./{file_path}[/bold]",
+                style="blue",
+                expand=False
+            )]
+            for item in items:
+                file_branch.add(format_branch(item))
+                header, syntax = format_detail(item)
+                renderables.extend((header, syntax, Text()))
+            details.append(Group(*renderables))
         
         console.print(tree)
         console.print()
         
         if show_code:
             console.print("[bold cyan]详细代码:[/bold cyan]\n")
-            
-            for file_path in sorted(grouped.keys()):
-                items = grouped[file_path]
-                
-                console.print(Panel(
-                    f"[bold]./{file_path}[/bold]",
-                    style="blue",
-                    expand=False
-                ))
-                
-                for item in sorted(items, key=lambda x: x.line_number):
-                    console.print(
-                        f"\n[bold yellow]{item.node_type.upper()}[/bold yellow] "
-                        f"[bold green]{item.name}[/bold green] "
-                        f"[dim](第 {item.line_number} 行)[/dim]"
-                    )
-                    
-                    syntax = Syntax(
-                        item.code,
-                        "python",
-                        theme="monokai",
-                        line_numbers=True,
-                        start_line=item.line_number,
-                        highlight_lines=set()
-                    )
-                    console.print(syntax)
-                    console.print()
+            # 每个文件的全部内容组合后只输出一次；按文件分批输出，避免一次渲染全部结果
+            for detail in details:
+                console.print(detail)
     
     @staticmethod
     def print_table(result: ExtractionResult) -> None:
         """以表格形式打印结果"""
+        from rich import box
+        from rich.table import Table
+        from rich.text import Text
+        
+        console = _get_console()
         if result.total_matches == 0:
             console.print("[yellow]未找到匹配项[/yellow]")
             return
         
         table = Table(
-            title=f"搜索标签: {result.config.tag}",
+            title=f"搜索标签: {', '.join(result.config.tags)}",
             box=box.ROUNDED,
             show_lines=True
         )
         
-        table.add_column("文件路径", style="cyan", no_wrap=False)
-        table.add_column("类型", style="magenta", justify="center")
-        table.add_column("名称", style="green")
-        table.add_column("行号", style="yellow", justify="right")
+        # 样式由每个单元格的 Text 携带
+        table.add_column("文件路径", no_wrap=False)
+        table.add_column("类型", justify="center")
+        table.add_column("名称")
+        table.add_column("行号", justify="right")
         
-        for item in sorted(result.results, key=lambda x: (str(x.file_path), x.line_number)):
-            icon = "🔧" if item.node_type == "function" else "📦"
-            table.add_row(
-                f"./{item.file_path}",
-                f"{icon} {item.node_type}",
-                item.name,
-                str(item.line_number)
-            )
+        # 直接传入 Text，Rich 无需再逐个解析标记语法；文件路径中的方括号也不会被误当作标记
+        # 复用已按行号排序的分组，只需对文件排序
+        grouped = result.group_by_file()
+        for file_path in sorted(grouped.keys(), key=os.fspath):
+            display_path = f"./{file_path}"
+            for item in grouped[file_path]:
+                table.add_row(
+                    Text(display_path, style="cyan"),
+                    Text(f"{_NODE_ICON[item.node_type]} {item.node_type}", style="magenta"),
+                    Text(item.name, style="green"),
+                    Text(str(item.line_number), style="yellow")
+                )
         
         console.print(table)
     
@@ -158,105 +241,113 @@ class OutputFormatter:
         """保存结果到文件"""
         output_path.parent.mkdir(parents=True, exist_ok=True)
         
-        if format == "markdown":
-            content = OutputFormatter._format_markdown(result)
-        else:
-            content = OutputFormatter._format_plain(result)
+        # 直接写入文件，不在内存中拼出完整内容
+        with output_path.open('w', encoding='utf-8', buffering=65536) as f:
+            if format == "markdown":
+                OutputFormatter._write_markdown(result, f)
+            else:
+                OutputFormatter._write_plain(result, f)
         
-        output_path.write_text(content, encoding='utf-8')
-        console.print(f"[green]✓[/green] 结果已保存到: [bold]{output_path}[/bold]")
+        _get_console().print(f"[green]✓[/green] 结果已保存到: [bold]{output_path}[/bold]")
     
     @staticmethod
     def _format_markdown(result: ExtractionResult) -> str:
         """格式化为 Markdown"""
-        lines = [
-            f"# 代码标签提取报告",
-            f"",
-            f"**搜索标签**: `{result.config.tag}`  ",
-        ]
+        buf = io.StringIO()
+        OutputFormatter._write_markdown(result, buf)
+        return buf.getvalue()
+    
+    @staticmethod
+    def _format_plain(result: ExtractionResult) -> str:
+        """格式化为纯文本"""
+        buf = io.StringIO()
+        OutputFormatter._write_plain(result, buf)
+        return buf.getvalue()
+    
+    @staticmethod
+    def _write_markdown(result: ExtractionResult, out: TextIO) -> None:
+        """格式化为 Markdown，逐段写入 out"""
+        out.write("# 代码标签提取报告\n")
+        out.write("\n")
+        out.write(f"**搜索标签**: `{', '.join(result.config.tags)}`  \n")
         
         if result.config.is_single_file:
-            lines.append(f"**搜索模式**: 单文件  ")
-            lines.append(f"**文件路径**: `{result.config.target_path}`  ")
+            out.write("**搜索模式**: 单文件  \n")
+            out.write(f"**文件路径**: `{result.config.target_path}`  \n")
         else:
-            lines.append(f"**搜索模式**: 目录递归  ")
-            lines.append(f"**搜索目录**: `{result.config.target_path}`  ")
-            lines.append(f"**处理文件**: {result.processed_files}  ")
+            out.write("**搜索模式**: 目录递归  \n")
+            out.write(f"**搜索目录**: `{result.config.target_path}`  \n")
+            out.write(f"**处理文件**: {result.processed_files}  \n")
         
-        lines.append(f"**找到匹配项**: {result.total_matches}  ")
-        lines.append("")
+        out.write(f"**找到匹配项**: {result.total_matches}  \n")
+        out.write("\n")
         
-        if result.skipped_files:
-            lines.append(f"**跳过文件**: {len(result.skipped_files)}  ")
-            lines.append("")
+        if result.skipped_count:
+            out.write(f"**跳过文件**: {result.skipped_count}  \n")
+            out.write("\n")
         
         if result.total_matches == 0:
-            lines.append("未找到匹配项。")
-            if result.skipped_files:
-                lines.append("")
-                lines.append("### 跳过的文件")
+            out.write("未找到匹配项。\n")
+            if result.skipped_count:
+                out.write("\n")
+                out.write("### 跳过的文件\n")
                 for skipped in result.skipped_files:
-                    lines.append(f"- {skipped}")
-            return "\n".join(lines)
+                    out.write(f"- {skipped}\n")
+                if result.skipped_count > len(result.skipped_files):
+                    out.write(f"- ... 还有 {result.skipped_count - len(result.skipped_files)} 个文件\n")
+            return
         
-        lines.append("---\n")
+        out.write("---\n\n")
         
         grouped = result.group_by_file()
         
-        for file_path in sorted(grouped.keys()):
+        for file_path in sorted(grouped.keys(), key=os.fspath):
             items = grouped[file_path]
-            lines.append(f"## 📄 `./{file_path}`\n")
+            out.write(f"## 📄 `./{file_path}`\n\n")
             
-            for item in sorted(items, key=lambda x: x.line_number):
-                icon = "🔧" if item.node_type == "function" else "📦"
-                lines.append(f"### {icon} `{item.name}` ({item.node_type}, 第 {item.line_number} 行)\n")
-                lines.append("```python")
-                lines.append(item.code)
-                lines.append("```\n")
-        
-        return "\n".join(lines)
+            for item in items:
+                icon = _NODE_ICON[item.node_type]
+                out.write(f"### {icon} `{item.name}` ({item.node_type}, 第 {item.line_number} 行)\n\n")
+                out.write("```python\n")
+                out.write(item.code)
+                out.write("\n```\n\n")
     
     @staticmethod
-    def _format_plain(result: ExtractionResult) -> str:
-        """格式化为纯文本"""
-        lines = [
-            f"搜索标签: {result.config.tag}",
-        ]
+    def _write_plain(result: ExtractionResult, out: TextIO) -> None:
+        """格式化为纯文本，逐段写入 out"""
+        out.write(f"搜索标签: {', '.join(result.config.tags)}\n")
         
         if result.config.is_single_file:
-            lines.append(f"搜索模式: 单文件")
-            lines.append(f"文件路径: {result.config.target_path}")
+            out.write("搜索模式: 单文件\n")
+            out.write(f"文件路径: {result.config.target_path}\n")
         else:
-            lines.append(f"搜索模式: 目录递归")
-            lines.append(f"搜索目录: {result.config.target_path}")
-            lines.append(f"处理文件: {result.processed_files}")
+            out.write("搜索模式: 目录递归\n")
+            out.write(f"搜索目录: {result.config.target_path}\n")
+            out.write(f"处理文件: {result.processed_files}\n")
         
-        lines.append(f"找到匹配项: {result.total_matches}")
-        lines.append("")
+        out.write(f"找到匹配项: {result.total_matches}\n")
+        out.write("\n")
         
         if result.total_matches == 0:
-            return "\n".join(lines + ["未找到匹配项。"])
+            out.write("未找到匹配项。\n")
+            return
         
+        separator = "=" * 60 + "\n"
         grouped = result.group_by_file()
         
-        for file_path in sorted(grouped.keys()):
+        for file_path in sorted(grouped.keys(), key=os.fspath):
             items = grouped[file_path]
-            lines.append("=" * 60)
-            lines.append(f"./{file_path}")
-            lines.append("=" * 60)
+            out.write(separator)
+            out.write(f"./{file_path}\n")
+            out.write(separator)
             
-            for item in sorted(items, key=lambda x: x.line_number):
-                lines.append(f"\n[{item.node_type.upper()}] {item.name} (第 {item.line_number} 行)")
-                lines.append("-" * 60)
+            for item in items:
+                out.write(f"\n[{item.node_type.upper()}] {item.name} (第 {item.line_number} 行)\n")
+                out.write("-" * 60 + "\n")
                 
-                code_lines = item.code.split('\n')
-                for i, line in enumerate(code_lines):
-                    line_num = item.line_number + i
-                    lines.append(f"{line_num:4d}    {line}")
-                lines.append("")
-        
-        return "\n".join(lines)
-
+                for i, line in enumerate(item.code.split('\n')):
+                    out.write(f"{item.line_number + i:4d}    {line}\n")
+                out.write("\n")
 
 # ============================================
 # 单元测试
@@ -379,6 +470,11 @@ class TestOutputFormatter:
             assert output_path.exists()
             content = output_path.read_text(encoding='utf-8')
             assert "# 代码标签提取报告" in content
+            assert content == OutputFormatter._format_markdown(result)
+            
+            output_path = Path(tmpdir) / "output.txt"
+            OutputFormatter.save_to_file(result, output_path, format="plain")
+            assert output_path.read_text(encoding='utf-8') == OutputFormatter._format_plain(result)
     
     def test_format_with_skipped_files(self) -> None:
         """测试包含跳过文件的格式化"""
@@ -436,4 +532,46 @@ class TestOutputFormatter:
         assert "test1.py" in markdown
         assert "test2.py" in markdown
         assert "func1" in markdown
-        assert "func2" in markdown
\ No newline at end of file
+        assert "func2" in markdown
+    
+    def test_compiled_formatters(self) -> None:
+        """测试预生成的匹配项格式化函数"""
+        tagged_code = TaggedCode(
+            file_path=Path("test.py"),
+            name="TestClass",
+            line_number=10,
+            code="class TestClass: pass",
+            node_type="class"
+        )
+        
+        assert _compile_branch_formatter()(tagged_code) == (
+            "📦 [green]TestClass[/green] [dim](class, 第 10 行)[/dim]"
+        )
+        
+        header, syntax = _compile_detail_formatter()(tagged_code)
+        assert header.startswith("\n[bold yellow]CLASS[/bold yellow] [bold green]TestClass[/bold green]")
+        assert syntax.code == "class TestClass: pass"
+        assert syntax.start_line == 10
+    
+    def test_format_sorts_files_by_path_string(self) -> None:
+        """测试文件按路径字符串排序"""
+        config = ExtractorConfig(
+            tag="TODO:",
+            target_path=Path(__file__).parent
+        )
+        
+        results = [
+            TaggedCode(
+                file_path=Path(file_path),
+                name="func",
+                line_number=1,
+                code="def func(): pass",
+                node_type="function"
+            )
+            for file_path in ("a/b.py", "a.py")
+        ]
+        result = ExtractionResult(config=config, results=results, processed_files=2)
+        
+        plain = OutputFormatter._format_plain(result)
+        
+        assert plain.index("./a.py") < plain.index("./a/b.py")
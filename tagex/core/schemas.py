@@ -2,67 +2,112 @@
 数据模型定义模块
 
 本模块定义了所有使用 Pydantic 的数据模型，包括：
-- TaggedCode: 存储带标签的代码信息
 - ExtractorConfig: 提取器配置
 - ExtractionResult: 提取结果
+
+以及每个匹配项都会创建的轻量值对象（slots 冻结 dataclass / NamedTuple）：
+- TaggedCode: 存储带标签的代码信息
 - NodeCollectionResult: 节点收集结果
+- DefinitionSpan: 与标签无关的定义位置，便于缓存
 """
 
+import stat
+from collections import defaultdict
+from dataclasses import dataclass
+from functools import cached_property
+from operator import attrgetter
 from pathlib import Path
-from typing import List, Dict, Union
-from pydantic import BaseModel, Field, field_validator, ConfigDict
+from typing import ClassVar, List, Dict, NamedTuple, Optional
+from pydantic import BaseModel, Field, field_validator, model_validator, PrivateAttr
+
+
+_NODE_TYPES = frozenset({'function', 'class'})
 
 
-class TaggedCode(BaseModel):
-    """存储带标签的代码信息"""
-    model_config = ConfigDict(frozen=True)
+def _validate_node(node_type: str, *line_numbers: int) -> None:
+    """校验节点类型和行号"""
+    if node_type not in _NODE_TYPES:
+        raise ValueError(f"node_type must be 'function' or 'class', got '{node_type}'")
+    for line_number in line_numbers:
+        if line_number < 1:
+            raise ValueError(f"line number must be >= 1, got {line_number}")
+
+
+@dataclass(slots=True, frozen=True)
+class TaggedCode:
+    """
+    存储带标签的代码信息
     
-    file_path: Path = Field(..., description="文件相对路径")
-    name: str = Field(..., description="函数或类名")
-    line_number: int = Field(..., ge=1, description="起始行号")
-    code: str = Field(..., description="源代码")
-    node_type: str = Field(..., description="节点类型: function 或 class")
+    每个匹配项创建一个实例，使用 slots dataclass 而非 Pydantic 模型，
+    只保留必要的校验以降低创建开销和内存占用
+    """
     
-    @field_validator('node_type')
-    @classmethod
-    def validate_node_type(cls, v: str) -> str:
-        if v not in ['function', 'class']:
-            raise ValueError(f"node_type must be 'function' or 'class', got '{v}'")
-        return v
+    file_path: Path    # 文件相对路径
+    name: str          # 函数或类名
+    line_number: int   # 起始行号
+    code: str          # 源代码
+    node_type: str     # 节点类型: function 或 class
+    
+    def __post_init__(self) -> None:
+        _validate_node(self.node_type, self.line_number)
+        # 与原 Pydantic 模型一致接受 str，统一为 Path，保证按文件分组时键一致
+        if not isinstance(self.file_path, Path):
+            object.__setattr__(self, "file_path", Path(self.file_path))
 
 
 class ExtractorConfig(BaseModel):
     """提取器配置"""
-    model_config = ConfigDict(arbitrary_types_allowed=True)
     
     tag: str = Field(..., min_length=1, description="要搜索的标签")
+    extra_tags: List[str] = Field(default_factory=list, description="额外同时搜索的标签")
     target_path: Path = Field(..., description="要搜索的文件或目录")
     include_functions: bool = Field(default=True, description="是否包含函数")
     include_classes: bool = Field(default=True, description="是否包含类")
     file_pattern: str = Field(default="*.py", description="文件匹配模式（仅目录时生效）")
+    # 库调用默认串行：并行使用的 forkserver 会重新导入调用方的 __main__，
+    # 没有 if __name__ == "__main__" 保护的脚本会因此出错
+    max_workers: Optional[int] = Field(default=1, ge=1, description="并行进程数（默认 1 为串行，None 为 CPU 核数）")
+    use_cache: bool = Field(default=False, description="是否使用磁盘缓存复用已解析文件的定义位置")
     
-    @field_validator('target_path')
-    @classmethod
-    def validate_target_path(cls, v: Union[str, Path]) -> Path:
-        path = Path(v) if isinstance(v, str) else v
-        path = path.resolve()
-        
-        if not path.exists():
-            raise ValueError(f"路径不存在: {path}")
+    _is_file: bool = PrivateAttr(default=False)
+    
+    @model_validator(mode='after')
+    def validate_target_path(self) -> 'ExtractorConfig':
+        # 只 stat 一次，文件类型记录下来供 is_single_file 使用
+        path = self.target_path.resolve()
+        try:
+            st = path.stat()
+        except OSError:
+            raise ValueError(f"路径不存在: {path}") from None
         
-        if path.is_file() and path.suffix != '.py':
+        is_file = stat.S_ISREG(st.st_mode)
+        if is_file and path.suffix != '.py':
             raise ValueError(f"不是 Python 文件: {path}")
         
-        return path
+        self.target_path = path
+        self._is_file = is_file
+        return self
+    
+    @field_validator('extra_tags')
+    @classmethod
+    def validate_extra_tags(cls, v: List[str]) -> List[str]:
+        if any(not tag for tag in v):
+            raise ValueError("标签不能为空")
+        return v
     
     @property
-    def is_single_file(self) -> bool:
-        """判断是否为单文件模式"""
-        return self.target_path.is_file()
+    def tags(self) -> List[str]:
+        """所有要搜索的标签"""
+        return [self.tag, *self.extra_tags]
     
     @property
+    def is_single_file(self) -> bool:
+        """判断是否为单文件模式（校验时已确定，不再访问文件系统）"""
+        return self._is_file
+    
+    @cached_property
     def base_path(self) -> Path:
-        """获取基准路径（用于计算相对路径）"""
+        """获取基准路径（用于计算相对路径），首次访问后缓存"""
         if self.is_single_file:
             return self.target_path.parent
         else:
@@ -71,35 +116,71 @@ class ExtractorConfig(BaseModel):
 
 class ExtractionResult(BaseModel):
     """提取结果"""
-    model_config = ConfigDict(arbitrary_types_allowed=True)
+    
+    # 跳过的文件最多保留的条数，其余只计数
+    SKIPPED_PREVIEW_SIZE: ClassVar[int] = 10
     
     config: ExtractorConfig
     results: List[TaggedCode] = Field(default_factory=list)
     processed_files: int = Field(default=0, ge=0)
-    skipped_files: List[str] = Field(default_factory=list)
+    skipped_files: List[str] = Field(default_factory=list, description="跳过的文件及原因（可能只是部分）")
+    skipped_count: int = Field(default=0, ge=0, description="跳过的文件总数")
+    
+    _grouped: Optional[Dict[Path, List[TaggedCode]]] = PrivateAttr(default=None)
+    
+    @model_validator(mode='after')
+    def validate_skipped_count(self) -> 'ExtractionResult':
+        # 只提供 skipped_files 时，总数即列表长度
+        self.skipped_count = max(self.skipped_count, len(self.skipped_files))
+        return self
     
     @property
     def total_matches(self) -> int:
         return len(self.results)
     
     def group_by_file(self) -> Dict[Path, List[TaggedCode]]:
-        """按文件路径分组"""
-        grouped: Dict[Path, List[TaggedCode]] = {}
+        """
+        按文件路径分组，每组按行号排序
+        
+        分组结果在首次调用时计算并缓存，打印和保存等多次输出共用同一份分组；
+        因此调用后不应再修改 results
+        """
+        if self._grouped is not None:
+            return self._grouped
+        
+        grouped: defaultdict[Path, List[TaggedCode]] = defaultdict(list)
         for item in self.results:
-            if item.file_path not in grouped:
-                grouped[item.file_path] = []
             grouped[item.file_path].append(item)
-        return grouped
+        for items in grouped.values():
+            items.sort(key=attrgetter('line_number'))
+        
+        # 转回普通 dict，避免调用方查询不存在的键时意外插入空列表
+        self._grouped = dict(grouped)
+        return self._grouped
 
 
-class NodeCollectionResult(BaseModel):
-    """节点收集结果"""
-    model_config = ConfigDict(frozen=True)
-    
-    name: str = Field(..., description="节点名称")
-    line_number: int = Field(..., ge=1, description="行号")
-    code: str = Field(..., description="源代码")
-    node_type: str = Field(..., description="节点类型")
+@dataclass(slots=True, frozen=True)
+class NodeCollectionResult:
+    """节点收集结果（只记录行范围，源代码由收集器按需截取）"""
+    
+    name: str          # 节点名称
+    line_number: int   # 行号
+    start_line: int    # 代码起始行号（包含装饰器和前导注释）
+    end_line: int      # 代码结束行号
+    node_type: str     # 节点类型
+    
+    def __post_init__(self) -> None:
+        _validate_node(self.node_type, self.line_number, self.start_line, self.end_line)
+
+
+class DefinitionSpan(NamedTuple):
+    """函数或类定义的位置（与标签无关，可缓存）"""
+    
+    name: str
+    node_type: str
+    line_number: int
+    start_line: int
+    end_line: int
 
 
 # ============================================
@@ -107,6 +188,7 @@ class NodeCollectionResult(BaseModel):
 # ============================================
 
 import pytest
+import tempfile
 from typing import no_type_check
 
 
@@ -138,6 +220,18 @@ class TestTaggedCode:
                 node_type="invalid"
             )
     
+    def test_file_path_normalized(self) -> None:
+        """测试 str 类型的文件路径被转换为 Path"""
+        tagged_code = TaggedCode(
+            file_path="test.py",  # type: ignore[arg-type]
+            name="test_func",
+            line_number=10,
+            code="def test_func(): pass",
+            node_type="function"
+        )
+        assert tagged_code.file_path == Path("test.py")
+        assert isinstance(tagged_code.file_path, Path)
+    
     def test_line_number_validation(self) -> None:
         """测试行号验证"""
         with pytest.raises(ValueError):
@@ -165,6 +259,8 @@ class TestExtractorConfig:
         assert config.tag == "TODO:"
         assert config.include_functions is True
         assert config.include_classes is True
+        # 库调用默认串行
+        assert config.max_workers == 1
     
     def test_invalid_path(self) -> None:
         """测试无效路径"""
@@ -190,6 +286,14 @@ class TestExtractorConfig:
         )
         assert config.is_single_file is True
     
+    def test_non_python_file(self) -> None:
+        """测试非 Python 文件"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            text_file = Path(tmpdir) / "notes.txt"
+            text_file.write_text("TODO:")
+            with pytest.raises(ValueError, match="不是 Python 文件"):
+                ExtractorConfig(tag="TODO:", target_path=text_file)
+    
     def test_base_path_single_file(self) -> None:
         """测试单文件模式的基准路径"""
         config = ExtractorConfig(
@@ -197,6 +301,7 @@ class TestExtractorConfig:
             target_path=Path(__file__)
         )
         assert config.base_path == Path(__file__).parent
+        assert config.base_path is config.base_path
 
 
 @no_type_check
@@ -260,6 +365,51 @@ class TestExtractionResult:
         assert Path("test2.py") in grouped
         assert len(grouped[Path("test1.py")]) == 2
         assert len(grouped[Path("test2.py")]) == 1
+    
+    def test_group_by_file_mixed_path_types(self) -> None:
+        """测试以 str 和 Path 给出的同一文件归入同一组"""
+        config = ExtractorConfig(
+            tag="TODO:",
+            target_path=Path(__file__).parent
+        )
+        
+        items = [
+            TaggedCode(
+                file_path=file_path,  # type: ignore[arg-type]
+                name="func",
+                line_number=line_number,
+                code="pass",
+                node_type="function"
+            )
+            for file_path, line_number in (("a.py", 1), (Path("a.py"), 2))
+        ]
+        result = ExtractionResult(config=config, results=items)
+        
+        assert list(result.group_by_file()) == [Path("a.py")]
+        assert len(result.group_by_file()[Path("a.py")]) == 2
+    
+    def test_group_by_file_sorted_and_cached(self) -> None:
+        """测试分组按行号排序且只计算一次"""
+        config = ExtractorConfig(
+            tag="TODO:",
+            target_path=Path(__file__).parent
+        )
+        
+        items = [
+            TaggedCode(
+                file_path=Path("test.py"),
+                name=f"func{line_number}",
+                line_number=line_number,
+                code="pass",
+                node_type="function"
+            )
+            for line_number in (30, 10, 20)
+        ]
+        result = ExtractionResult(config=config, results=items)
+        
+        grouped = result.group_by_file()
+        assert [item.line_number for item in grouped[Path("test.py")]] == [10, 20, 30]
+        assert result.group_by_file() is grouped
 
 
 @no_type_check
@@ -271,9 +421,22 @@ class TestNodeCollectionResult:
         result = NodeCollectionResult(
             name="test_func",
             line_number=10,
-            code="def test_func(): pass",
+            start_line=9,
+            end_line=12,
             node_type="function"
         )
         assert result.name == "test_func"
         assert result.line_number == 10
-        assert result.node_type == "function"
\ No newline at end of file
+        assert (result.start_line, result.end_line) == (9, 12)
+        assert result.node_type == "function"
+    
+    def test_invalid_line_range(self) -> None:
+        """测试行号验证"""
+        with pytest.raises(ValueError, match="line number must be >= 1"):
+            NodeCollectionResult(
+                name="test_func",
+                line_number=10,
+                start_line=0,
+                end_line=12,
+                node_type="function"
+            )
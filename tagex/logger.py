@@ -6,8 +6,13 @@ This module provides a configurable logger that:
 2. Saves all logs (regardless of level) to local log files
 3. Includes the log level in the output format
 4. Uses RichHandler for colorful, formatted output to terminal
+
+The default logger is configured on import unless the TAGEX_NO_AUTO_LOG
+environment variable is set; the log file is only created once the first
+record is written.
 """
 
+import os
 import sys
 from typing import Any
 from loguru import logger as loguru_logger
@@ -19,13 +24,19 @@ from pathlib import Path
 logger = None
 
 
-def setup_logger(level: str = "INFO", log_file_path: str | Path | None = None) -> Any:
+def setup_logger(
+    level: str = "INFO",
+    log_file_path: str | Path | None = None,
+    enqueue: bool = False
+) -> Any:
     """
     Setup and configure the logger.
 
     Args:
         level (str): Minimum log level to display in terminal (default: 'INFO')
         log_file_path (str): Path for log file (default: logs/app_{date}.log)
+        enqueue (bool): Write the log file through a background queue, needed
+            only when several processes log to the same file (default: False)
 
     Returns:
         Logger: Configured logger instance
@@ -61,13 +72,9 @@ def setup_logger(level: str = "INFO", log_file_path: str | Path | None = None) -
         }]
     )
     
-    # Create logs directory if it doesn't exist
-    logs_dir = Path("logs")
-    logs_dir.mkdir(exist_ok=True)
-    
     # Set default log file path if not provided
     if log_file_path is None:
-        log_file_path = logs_dir / "tagex_{time:YYYY-MM-DD}.log"
+        log_file_path = Path("logs") / "tagex_{time:YYYY-MM-DD}.log"
     
     # Add file handler - no filter, captures all levels
     loguru_logger.add(
@@ -76,9 +83,9 @@ def setup_logger(level: str = "INFO", log_file_path: str | Path | None = None) -
         retention="7 days",  # Keep logs for 7 days
         level="TRACE",  # Log everything to file
         colorize=False,  # No need for colors in file
-        compression=None,
         format="{time:YYYY-MM-DD HH:mm:ss} | {level:<8} | {file}:{line} | {message}",
-        enqueue=True  # Thread-safe logging
+        delay=True,  # Create the file (and its directory) on the first record
+        enqueue=enqueue
     )
 
     logger = loguru_logger  # Assign the configured logger to the global variable
@@ -95,5 +102,6 @@ def init_default_logger() -> None:
         setup_logger("INFO")
 
 
-# Initialize logger with default settings on import
-init_default_logger()
\ No newline at end of file
+# Initialize logger with default settings on import, unless opted out
+if not os.environ.get("TAGEX_NO_AUTO_LOG"):
+    init_default_logger()
\ No newline at end of file